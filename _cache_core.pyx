@@ -0,0 +1,252 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+"""Compiled LRUCache and LFUCache with the same interface as the classes in main.py.
+
+Build with `python setup.py build_ext --inplace`; main.py falls back to the
+pure-Python classes when this module is not available.
+
+Entries live in slots: keys and values in Python lists, recency links in a C
+array of Link structs. A dict maps each key to its slot. Slots are handed out in
+order and the arrays double as they fill, up to what `capacity` needs, so a large
+capacity costs nothing until keys arrive.
+"""
+from cpython.mem cimport PyMem_Realloc, PyMem_Free
+
+cdef enum:
+    INITIAL_SLOTS = 16
+
+cdef struct Link:
+    Py_ssize_t prev
+    Py_ssize_t next
+
+
+cdef inline void _unlink(Link* links, Py_ssize_t x) noexcept:
+    links[links[x].prev].next = links[x].next
+    links[links[x].next].prev = links[x].prev
+
+
+cdef inline void _push_front(Link* links, Py_ssize_t head, Py_ssize_t x) noexcept:
+    cdef Py_ssize_t first = links[head].next
+    links[x].prev = head
+    links[x].next = first
+    links[first].prev = x
+    links[head].next = x
+
+
+cdef void* _resize(void* block, size_t size) except NULL:
+    """PyMem_Realloc that raises MemoryError, leaving the old block intact."""
+    cdef void* grown = PyMem_Realloc(block, size)
+    if grown == NULL:
+        raise MemoryError()
+    return grown
+
+
+cdef class LRUCache:
+    """A robust LRU Cache over a C doubly-linked list; slot 0 is the sentinel."""
+    cdef readonly Py_ssize_t capacity
+    cdef dict index
+    cdef list keys, values
+    cdef Link* links
+    cdef Py_ssize_t n_links
+
+    def __cinit__(self, Py_ssize_t capacity):
+        if capacity <= 0: raise ValueError("Capacity must be a positive integer.")
+        self.capacity = capacity
+        self.index = {}
+        self.keys = [None]
+        self.values = [None]
+        self.n_links = min(capacity + 1, INITIAL_SLOTS)
+        self.links = <Link*> _resize(NULL, self.n_links * sizeof(Link))
+        self.links[0].prev = self.links[0].next = 0
+
+    def __dealloc__(self):
+        PyMem_Free(self.links)
+
+    cdef int _grow(self) except -1:
+        """Doubles the link array, never past the capacity slots and the sentinel."""
+        cdef Py_ssize_t n = min(2 * self.n_links, self.capacity + 1)
+        self.links = <Link*> _resize(self.links, n * sizeof(Link))
+        self.n_links = n
+        return 0
+
+    def get(self, key):
+        slot = self.index.get(key)
+        if slot is None:
+            return None
+        _unlink(self.links, slot)
+        _push_front(self.links, 0, slot)
+        return self.values[slot]
+
+    def touch(self, key):
+        """Marks a key as most recently used without reading it; returns whether it was cached."""
+        slot = self.index.get(key)
+        if slot is None:
+            return False
+        _unlink(self.links, slot)
+        _push_front(self.links, 0, slot)
+        return True
+
+    def set(self, key, value):
+        """Replaces the value of a key that is already cached, leaving its recency alone."""
+        self.values[<Py_ssize_t> self.index[key]] = value
+
+    def put(self, key, value):
+        """Inserts or updates a key and returns the evicted key, if any."""
+        cdef Py_ssize_t slot
+        evict_key = None
+        found = self.index.get(key)
+        if found is not None:
+            slot = found
+            _unlink(self.links, slot)
+        elif len(self.index) == self.capacity:
+            # Evicting before inserting is equivalent: the new key is never the victim.
+            slot = self.links[0].prev
+            _unlink(self.links, slot)
+            evict_key = self.keys[slot]
+            del self.index[evict_key]
+        else:
+            slot = len(self.keys)
+            if slot == self.n_links:
+                self._grow()
+            self.keys.append(None)
+            self.values.append(None)
+        self.index[key] = slot
+        self.keys[slot] = key
+        self.values[slot] = value
+        _push_front(self.links, 0, slot)
+        return evict_key
+
+    def get_state(self):
+        cdef Py_ssize_t slot = self.links[0].next
+        items = []
+        while slot != 0:
+            items.append(self.keys[slot])
+            slot = self.links[slot].next
+        return items
+
+
+cdef class LFUCache:
+    """A robust LFU Cache over C linked lists, one per access count.
+
+    Entries and the sentinels of the non-empty frequency buckets share one id space;
+    a sentinel freed by an emptied bucket goes on a free list for reuse. Within a
+    bucket the most recently bumped entry is at the front and the eviction victim at
+    the back.
+    """
+    cdef readonly Py_ssize_t capacity
+    cdef dict index, buckets
+    cdef list keys, values
+    cdef Link* links
+    cdef Py_ssize_t* counts
+    cdef Py_ssize_t* free_sentinels
+    cdef Py_ssize_t n_links, n_free, min_count
+
+    def __cinit__(self, Py_ssize_t capacity):
+        self.capacity = capacity
+        self.index = {}
+        self.buckets = {}
+        self.keys = []
+        self.values = []
+        self.n_links = 0
+        self.n_free = 0
+        self.min_count = 0
+
+    def __dealloc__(self):
+        PyMem_Free(self.links)
+        PyMem_Free(self.counts)
+        PyMem_Free(self.free_sentinels)
+
+    cdef Py_ssize_t _new_id(self) except -1:
+        """Hands out the next unused id, doubling the C arrays when they are full."""
+        cdef Py_ssize_t new_id = len(self.keys), n
+        if new_id == self.n_links:
+            # At most `capacity` entries and one sentinel per entry are live at once.
+            n = min(max(2 * self.n_links, INITIAL_SLOTS), 2 * self.capacity + 1)
+            self.links = <Link*> _resize(self.links, n * sizeof(Link))
+            self.counts = <Py_ssize_t*> _resize(self.counts, n * sizeof(Py_ssize_t))
+            self.free_sentinels = <Py_ssize_t*> _resize(self.free_sentinels, n * sizeof(Py_ssize_t))
+            self.n_links = n
+        self.keys.append(None)
+        self.values.append(None)
+        return new_id
+
+    cdef Py_ssize_t _bucket(self, Py_ssize_t count) except -1:
+        cdef Py_ssize_t head
+        found = self.buckets.get(count)
+        if found is not None:
+            return found
+        if self.n_free:
+            self.n_free -= 1
+            head = self.free_sentinels[self.n_free]
+        else:
+            head = self._new_id()
+        self.links[head].prev = self.links[head].next = head
+        self.buckets[count] = head
+        return head
+
+    cdef void _remove(self, Py_ssize_t slot):
+        """Unlinks a slot and drops its bucket if that leaves it empty."""
+        cdef Py_ssize_t count = self.counts[slot], head
+        _unlink(self.links, slot)
+        head = self.buckets[count]
+        if self.links[head].next == head:
+            del self.buckets[count]
+            self.free_sentinels[self.n_free] = head
+            self.n_free += 1
+            if self.min_count == count:
+                self.min_count += 1
+
+    cdef void _bump(self, Py_ssize_t slot):
+        """Moves a resident slot from its frequency bucket to the next one."""
+        self._remove(slot)
+        self.counts[slot] += 1
+        _push_front(self.links, self._bucket(self.counts[slot]), slot)
+
+    def get(self, key):
+        slot = self.index.get(key)
+        if slot is None:
+            return None
+        self._bump(slot)
+        return self.values[slot]
+
+    def put(self, key, value):
+        """Inserts or updates a key and returns the evicted key, if any."""
+        cdef Py_ssize_t slot
+        if self.capacity <= 0: return None
+
+        found = self.index.get(key)
+        if found is not None:
+            self.values[found] = value
+            self._bump(found)
+            return None
+
+        evict_key = None
+        if len(self.index) >= self.capacity:
+            slot = self.links[<Py_ssize_t> self.buckets[self.min_count]].prev
+            self._remove(slot)
+            evict_key = self.keys[slot]
+            del self.index[evict_key]
+        else:
+            slot = self._new_id()
+
+        self.index[key] = slot
+        self.keys[slot] = key
+        self.values[slot] = value
+        self.counts[slot] = 1
+        _push_front(self.links, self._bucket(1), slot)
+        self.min_count = 1
+        return evict_key
+
+    def get_state(self):
+        cdef Py_ssize_t head, slot
+        items = []
+        for count in sorted(self.buckets):
+            head = self.buckets[count]
+            slot = self.links[head].next
+            while slot != head:
+                items.append(self.keys[slot])
+                slot = self.links[slot].next
+        return items
+
+    def get_frequencies(self):
+        """Access counts aligned with get_state(), so clients can replay diffs."""
+        return [self.counts[<Py_ssize_t> self.index[key]] for key in self.get_state()]
@@ -1,10 +1,17 @@
 import time
-from collections import OrderedDict, defaultdict
+from collections import OrderedDict
 import asyncio
+import orjson
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
-from pydantic import BaseModel
-import random
-from typing import Dict, List, Any
+import msgspec
+import numpy as np
+from typing import Dict, List, Any, Optional
+
+try:
+    from numba import njit
+except ImportError:  # Numba is optional; without it the batch simulators run as plain Python.
+    def njit(*args, **kwargs):
+        return args[0] if args and callable(args[0]) else (lambda fn: fn)
 
 # --- NEW: Import CORS Middleware ---
 from fastapi.middleware.cors import CORSMiddleware
@@ -15,29 +22,51 @@ from fastapi.middleware.cors import CORSMiddleware
 
 class LRUCache:
     """A robust LRU Cache implemented with Python's built-in OrderedDict."""
+    __slots__ = ("capacity", "cache")
+
     def __init__(self, capacity: int):
         if capacity <= 0: raise ValueError("Capacity must be a positive integer.")
         self.capacity = capacity
         self.cache = OrderedDict()
 
     def get(self, key: str) -> Any:
-        if key not in self.cache:
+        try:
+            value = self.cache[key]
+        except KeyError:
             return None
         self.cache.move_to_end(key)
-        return self.cache[key]
+        return value
 
-    def put(self, key: str, value: Any) -> None:
-        if key in self.cache:
+    def touch(self, key: str) -> bool:
+        """Marks a key as most recently used without reading it; returns whether it was cached."""
+        try:
             self.cache.move_to_end(key)
+        except KeyError:
+            return False
+        return True
+
+    def set(self, key: str, value: Any) -> None:
+        """Replaces the value of a key that is already cached, leaving its recency alone."""
+        if key not in self.cache: raise KeyError(key)
+        self.cache[key] = value
+
+    def put(self, key: str, value: Any) -> Optional[str]:
+        """Inserts or updates a key and returns the evicted key, if any."""
         self.cache[key] = value
+        self.cache.move_to_end(key)
         if len(self.cache) > self.capacity:
-            self.cache.popitem(last=False)
+            evict_key, _ = self.cache.popitem(last=False)
+            return evict_key
+        return None
 
     def get_state(self) -> List[str]:
         return list(reversed(self.cache.keys()))
 
 class LRUKCache:
     """An LRU-K Cache built on the robust LRUCache."""
+    __slots__ = ("k", "initial_k", "capacity", "adaptive", "_history_cache", "_main_cache",
+                 "_ops_counter", "_history_hits", "_promotions")
+
     def __init__(self, capacity: int, k: int = 2, adaptive: bool = False):
         if capacity <= 0 or k <= 0: raise ValueError("Capacity and K must be positive integers.")
         self.k, self.initial_k, self.capacity, self.adaptive = k, k, capacity, adaptive
@@ -58,70 +87,91 @@ class LRUKCache:
         self._ops_counter += 1
         if self._ops_counter >= 20: self._adapt()
         event = {"key": key, "location": "none", "promoted": False, "evicted": None}
-        if self._main_cache.get(key) is not None:
+        if self._main_cache.touch(key):
             event["location"] = "main_cache"
             return event
-        history_timestamps = self._history_cache.get(key)
-        if history_timestamps is not None:
+        # The history maps each key to how many times it has been seen; only that
+        # count is ever compared with K, so no access timestamps are kept. get()
+        # already moved the key to the front, so the new count is stored in place.
+        seen = self._history_cache.get(key)
+        if seen is not None:
             self._history_hits += 1
             event["location"] = "history_cache"
-            history_timestamps.append(time.time())
-            if len(history_timestamps) >= self.k:
+            seen += 1
+            self._history_cache.set(key, seen)
+            if seen >= self.k:
                 self._promotions += 1
                 event["promoted"] = True
-                self._main_cache.put(key, value)
-            else:
-                self._history_cache.put(key, history_timestamps)
+                event["evicted"] = self._main_cache.put(key, value)
             return event
         event["location"] = "new"
-        self._history_cache.put(key, [time.time()])
+        event["evicted"] = self._history_cache.put(key, 1)
         return event
 
     def get_state(self):
         return {"history_cache": self._history_cache.get_state(), "main_cache": self._main_cache.get_state(), "current_k": self.k}
 
 class LFUCache:
-    """A robust Least Frequently Used (LFU) Cache."""
+    """A robust Least Frequently Used (LFU) Cache.
+
+    Each frequency bucket is a plain dict used as an ordered set: dicts keep
+    insertion order, so the first key in a bucket is its least recently used.
+    """
+    __slots__ = ("capacity", "vals", "counts", "lists", "min_count")
+
     def __init__(self, capacity: int):
         self.capacity = capacity
         self.vals = {}
-        self.counts = defaultdict(int)
-        self.lists = defaultdict(OrderedDict)
+        self.counts: Dict[str, int] = {}
+        self.lists: Dict[int, Dict[str, None]] = {}
         self.min_count = 0
 
-    def get(self, key: str) -> Any:
-        if key not in self.vals:
-            return None
-        
+    def _bump(self, key: str) -> None:
+        """Moves a resident key from its frequency bucket to the next one."""
         count = self.counts[key]
-        del self.lists[count][key]
-
-        if not self.lists[count] and self.min_count == count:
-            self.min_count += 1
+        bucket = self.lists[count]
+        del bucket[key]
+        if not bucket:
+            del self.lists[count]
+            if self.min_count == count:
+                self.min_count += 1
 
         new_count = count + 1
         self.counts[key] = new_count
-        self.lists[new_count][key] = None
-        
-        return self.vals[key]
+        self.lists.setdefault(new_count, {})[key] = None
 
-    def put(self, key: str, value: any) -> None:
-        if self.capacity == 0: return
+    def get(self, key: str) -> Any:
+        try:
+            value = self.vals[key]
+        except KeyError:
+            return None
+        self._bump(key)
+        return value
+
+    def put(self, key: str, value: any) -> Optional[str]:
+        """Inserts or updates a key and returns the evicted key, if any."""
+        if self.capacity <= 0: return None
 
         if key in self.vals:
             self.vals[key] = value
-            self.get(key)
-            return
+            self._bump(key)
+            return None
 
+        evict_key = None
         if len(self.vals) >= self.capacity:
-            evict_key, _ = self.lists[self.min_count].popitem(last=False)
+            bucket = self.lists[self.min_count]
+            evict_key = next(iter(bucket))
+            del bucket[evict_key]
+            if not bucket:
+                del self.lists[self.min_count]
             del self.vals[evict_key]
             del self.counts[evict_key]
 
         self.vals[key] = value
         self.counts[key] = 1
-        self.lists[1][key] = None
+        self.lists.setdefault(1, {})[key] = None
         self.min_count = 1
+        return evict_key
 
     def get_state(self):
         all_items = []
@@ -130,6 +180,134 @@ class LFUCache:
                 all_items.append(key)
         return all_items
 
+    def get_frequencies(self) -> List[int]:
+        """Access counts aligned with get_state(), so clients can replay diffs."""
+        return [self.counts[key] for key in self.get_state()]
+
+try:  # Prefer the compiled cores from _cache_core.pyx when they have been built.
+    from _cache_core import LRUCache, LFUCache
+except ImportError:
+    pass
+
+# --------------------------------------------------------------------------
+# --- BATCH SIMULATORS (fast mode) ---
+# --------------------------------------------------------------------------
+# These mirror the classes above on int-encoded keys and only count hits, so they
+# can be compiled with Numba. Each list is an intrusive circular doubly-linked list
+# over key ids, with sentinel nodes stored past the last key id.
+
+@njit(cache=True, nogil=True)
+def _unlink(prev, nxt, x):
+    nxt[prev[x]] = nxt[x]
+    prev[nxt[x]] = prev[x]
+
+@njit(cache=True, nogil=True)
+def _push_front(prev, nxt, head, x):
+    first = nxt[head]
+    nxt[head], prev[x], nxt[x], prev[first] = x, head, first, x
+
+@njit(cache=True, nogil=True)
+def _new_lists(n_nodes, n_sentinels):
+    prev, nxt = np.empty(n_nodes + n_sentinels, np.int64), np.empty(n_nodes + n_sentinels, np.int64)
+    for s in range(n_nodes, n_nodes + n_sentinels):
+        prev[s] = nxt[s] = s
+    return prev, nxt
+
+@njit(cache=True, nogil=True)
+def simulate_lru(keys, n_keys, capacity):
+    prev, nxt = _new_lists(n_keys, 1)
+    resident = np.zeros(n_keys, np.bool_)
+    head, size, hits = n_keys, 0, 0
+    for x in keys:
+        if resident[x]:
+            hits += 1
+            _unlink(prev, nxt, x)
+        else:
+            resident[x] = True
+            size += 1
+        _push_front(prev, nxt, head, x)
+        if size > capacity:
+            oldest = prev[head]
+            _unlink(prev, nxt, oldest)
+            resident[oldest] = False
+            size -= 1
+    return hits
+
+@njit(cache=True, nogil=True)
+def simulate_lfu(keys, n_keys, capacity):
+    # One bucket sentinel per possible count; a bucket's oldest key sits at its tail.
+    prev, nxt = _new_lists(n_keys, len(keys) + 2)
+    counts = np.zeros(n_keys, np.int64)
+    size, min_count, hits = 0, 0, 0
+    for x in keys:
+        count = counts[x]
+        if count > 0:
+            hits += 1
+            _unlink(prev, nxt, x)
+            if nxt[n_keys + count] == n_keys + count and min_count == count:
+                min_count += 1
+            counts[x] = count + 1
+            _push_front(prev, nxt, n_keys + count + 1, x)
+            continue
+        if capacity <= 0:
+            continue
+        if size >= capacity:
+            victim = prev[n_keys + min_count]
+            _unlink(prev, nxt, victim)
+            counts[victim] = 0
+            size -= 1
+        counts[x] = 1
+        _push_front(prev, nxt, n_keys + 1, x)
+        size += 1
+        min_count = 1
+    return hits
+
+@njit(cache=True, nogil=True)
+def simulate_lruk(keys, n_keys, capacity, k, adaptive):
+    hist_prev, hist_nxt = _new_lists(n_keys, 1)
+    main_prev, main_nxt = _new_lists(n_keys, 1)
+    in_main = np.zeros(n_keys, np.bool_)
+    hist_counts = np.zeros(n_keys, np.int64)
+    head, hist_size, main_size, hits = n_keys, 0, 0, 0
+    initial_k, ops, history_hits, promotions = k, 0, 0, 0
+    for x in keys:
+        ops += 1
+        if ops >= 20 and adaptive and history_hits != 0:
+            promo_ratio = promotions / history_hits
+            if promo_ratio < 0.1 and k < 5: k += 1
+            elif promo_ratio > 0.4 and k > initial_k: k -= 1
+            ops, history_hits, promotions = 0, 0, 0
+        if in_main[x]:
+            hits += 1
+            _unlink(main_prev, main_nxt, x)
+            _push_front(main_prev, main_nxt, head, x)
+            continue
+        if hist_counts[x] > 0:
+            history_hits += 1
+            _unlink(hist_prev, hist_nxt, x)
+            _push_front(hist_prev, hist_nxt, head, x)
+            hist_counts[x] += 1
+            if hist_counts[x] >= k:
+                promotions += 1
+                in_main[x] = True
+                _push_front(main_prev, main_nxt, head, x)
+                main_size += 1
+                if main_size > capacity:
+                    oldest = main_prev[head]
+                    _unlink(main_prev, main_nxt, oldest)
+                    in_main[oldest] = False
+                    main_size -= 1
+            continue
+        hist_counts[x] = 1
+        _push_front(hist_prev, hist_nxt, head, x)
+        hist_size += 1
+        if hist_size > capacity:
+            oldest = hist_prev[head]
+            _unlink(hist_prev, hist_nxt, oldest)
+            hist_counts[oldest] = 0
+            hist_size -= 1
+    return hits
+
 # --------------------------------------------------------------------------
 # --- FASTAPI SERVER LOGIC ---
 # --------------------------------------------------------------------------
@@ -160,7 +338,7 @@ app.add_middleware(
     allow_headers=["*"], # Allows all headers
 )
 
-class SimulationConfig(BaseModel):
+class SimulationConfig(msgspec.Struct):
     k_value: int
     capacity: int
     workload_type: str
@@ -169,57 +347,172 @@ class SimulationConfig(BaseModel):
     speed: float
     custom_workload: str
     active_caches: Dict[str, bool]
+    # With speed 0, skip the step-by-step frames and report only the final hit counts.
+    # API-only: the bundled frontend never sends speed 0.
+    fast_mode: bool = False
+
+# Shared "item-N" names, grown on demand so workloads index into it instead of formatting.
+# It stops growing at _ITEM_NAMES_CAP so one huge request cannot pin memory for good.
+_ITEM_NAMES: List[str] = []
+_ITEM_NAMES_CAP = 1_000_001
+
+def _item_names(count: int) -> List[str]:
+    """Returns a list holding at least the first `count` item names."""
+    if len(_ITEM_NAMES) < min(count, _ITEM_NAMES_CAP):
+        _ITEM_NAMES.extend(f"item-{i}" for i in range(len(_ITEM_NAMES), min(count, _ITEM_NAMES_CAP)))
+    if count <= _ITEM_NAMES_CAP:
+        return _ITEM_NAMES
+    return _ITEM_NAMES + [f"item-{i}" for i in range(_ITEM_NAMES_CAP, count)]
 
 def generate_workload(workload_type: str, custom_text: str, size: int) -> List[str]:
+    size = max(size, 0)
     if workload_type == "custom":
         items = [item.strip() for item in custom_text.replace(',', ' ').replace('\n', ' ').split() if item.strip()]
         return items if items else []
     if workload_type == "scan":
-        return [f"item-{i}" for i in range(size)]
+        return _item_names(size)[:size]
     if workload_type == "realistic":
-        hot_items = [f"item-{i}" for i in range(5)]
-        cold_items = [f"item-{i}" for i in range(5, size)]
-        return [random.choice(hot_items) if random.random() < 0.8 else random.choice(cold_items) for _ in range(size)]
-    return [f"item-{random.randint(1, 20)}" for _ in range(size)]
+        # 80% of accesses hit the 5 hot items, the rest are spread over the cold ones.
+        names = _item_names(max(size, 5))
+        idx = np.random.randint(0, 5, size)
+        if size > 5:
+            idx = np.where(np.random.random(size) < 0.8, idx, np.random.randint(5, size, size))
+        return [names[j] for j in idx.tolist()]
+    names = _item_names(21)
+    return [names[j] for j in np.random.randint(1, 21, size).tolist()]
+
+# With speed 0, frames are throttled to about one per display refresh.
+_FRAME_INTERVAL = 1 / 60
+
+async def _simulate(caches: Dict[str, Any], workload: List[str], queue: asyncio.Queue, throttle: bool = False) -> None:
+    """Runs the workload through the caches, queueing one encoded frame per step.
+
+    With `throttle`, a frame is queued at most every _FRAME_INTERVAL seconds (plus
+    the final step), and every throttled frame carries full snapshots.
+    Ends with None, or with the raised exception so the sender can re-raise it.
+    """
+    try:
+        total_steps = len(workload)
+        # Workloads reuse a small key alphabet, so build each cached value once.
+        values = {k: f"v-{k}" for k in set(workload)}
+
+        # One frame dict, updated in place every step; it is encoded before the next update.
+        # Hit rates are not sent: the frontend derives them as hits / step.
+        state_to_send = {"step": 0, "total_steps": total_steps, "current_key": ""}
+        lru_frame = {"hit": False, "evicted": None, "hits": 0}
+        lfu_frame = {"hit": False, "evicted": None, "hits": 0}
+        lruk_frame = {"hits": 0, "last_event": None, "current_k": 0}
+        for name, frame in (('lru', lru_frame), ('lfu', lfu_frame), ('lruk', lruk_frame)):
+            if caches[name]: state_to_send[f"{name}_cache"] = frame
+
+        # Hoist the per-step lookups out of the loop; a None cache is inactive.
+        lru, lfu, lruk = caches['lru'], caches['lfu'], caches['lruk']
+        lru_get, lru_put = (lru.get, lru.put) if lru else (None, None)
+        lfu_get, lfu_put = (lfu.get, lfu.put) if lfu else (None, None)
+        lruk_put = lruk.put if lruk else None
+        enqueue, dumps = queue.put, orjson.dumps
+
+        last_step, last_sent = total_steps - 1, float("-inf")
+
+        for i, key in enumerate(workload):
+            state_to_send['step'] = i + 1
+            state_to_send['current_key'] = key
+
+            if lru:
+                if lru_get(key) is not None:
+                    lru_frame['hit'], lru_frame['evicted'] = True, None
+                    lru_frame['hits'] += 1
+                else: lru_frame['hit'], lru_frame['evicted'] = False, lru_put(key, values[key])
+
+            if lfu:
+                if lfu_get(key) is not None:
+                    lfu_frame['hit'], lfu_frame['evicted'] = True, None
+                    lfu_frame['hits'] += 1
+                else: lfu_frame['hit'], lfu_frame['evicted'] = False, lfu_put(key, values[key])
+
+            if lruk:
+                lruk_event = lruk_put(key, values[key])
+                if lruk_event['location'] == 'main_cache': lruk_frame['hits'] += 1
+                lruk_frame['last_event'], lruk_frame['current_k'] = lruk_event, lruk.k
+
+            if throttle:
+                now = time.monotonic()
+                if now - last_sent < _FRAME_INTERVAL and i < last_step:
+                    continue
+                last_sent = now
+
+            # Only the first frame carries full snapshots; afterwards each cache reports
+            # what changed this step and the frontend replays it onto its own copy.
+            # Throttled frames skip steps, so each of them carries snapshots instead.
+            if i == 0 or throttle:
+                if lru: lru_frame['state'] = lru.get_state()
+                if lfu: lfu_frame.update(state=lfu.get_state(), counts=lfu.get_frequencies())
+                if lruk: lruk_frame['state'] = lruk.get_state()
+
+            await enqueue(dumps(state_to_send))
+            # Queue.put only suspends when the queue is full, so yield explicitly to let
+            # the sender ship this frame while the simulation carries on.
+            await asyncio.sleep(0)
+
+            if i == 0 and not throttle:
+                for frame in (lru_frame, lfu_frame, lruk_frame):
+                    frame.pop('state', None)
+                    frame.pop('counts', None)
+        await queue.put(None)
+    except Exception as e:
+        await queue.put(e)
+
+def simulate_batch(config: SimulationConfig, workload: List[str]) -> dict:
+    """Runs the whole workload through the batch simulators and builds one final frame."""
+    active, capacity, k = config.active_caches, config.capacity, config.k_value
+    # Same checks as the cache constructors, which this path never calls.
+    if active.get('lru') and capacity <= 0: raise ValueError("Capacity must be a positive integer.")
+    if active.get('lruk') and (capacity <= 0 or k <= 0): raise ValueError("Capacity and K must be positive integers.")
+    ids: Dict[str, int] = {}
+    keys = np.fromiter((ids.setdefault(key, len(ids)) for key in workload), dtype=np.int64, count=len(workload))
+    total_steps = len(workload)
+    hits = {}
+    if active.get('lru'): hits['lru'] = simulate_lru(keys, len(ids), capacity)
+    if active.get('lfu'): hits['lfu'] = simulate_lfu(keys, len(ids), capacity)
+    if active.get('lruk'): hits['lruk'] = simulate_lruk(keys, len(ids), capacity, k, config.adaptive_k)
+    state_to_send = {"step": total_steps, "total_steps": total_steps, "current_key": workload[-1], "fast_mode": True}
+    for name, count in hits.items():
+        state_to_send[f"{name}_cache"] = {"hits": int(count)}
+    return state_to_send
 
 @app.websocket("/ws/simulation")
 async def simulation_endpoint(websocket: WebSocket):
     await websocket.accept()
     try:
-        config_data = await websocket.receive_json()
-        config = SimulationConfig(**config_data)
+        # Decode and validate in one step, skipping Starlette's json.loads.
+        config = msgspec.json.decode(await websocket.receive_text(), type=SimulationConfig)
         workload = generate_workload(config.workload_type, config.custom_workload, config.workload_size)
         if not workload:
             await websocket.close(code=1000, reason="Empty workload")
             return
 
+        if config.fast_mode and config.speed == 0:
+            # Off the event loop: without Numba the batch run is plain Python.
+            frame = await asyncio.to_thread(simulate_batch, config, workload)
+            await websocket.send_bytes(orjson.dumps(frame))
+            await websocket.close()
+            return
+
         caches = {
             'lru': LRUCache(config.capacity) if config.active_caches.get('lru') else None,
             'lfu': LFUCache(config.capacity) if config.active_caches.get('lfu') else None,
             'lruk': LRUKCache(config.capacity, config.k_value, config.adaptive_k) if config.active_caches.get('lruk') else None
         }
-        hits = {'lru': 0, 'lfu': 0, 'lruk': 0}
-
-        for i, key in enumerate(workload):
-            state_to_send = {"step": i + 1, "total_steps": len(workload), "current_key": key}
-            
-            if caches['lru']:
-                if caches['lru'].get(key) is not None: hits['lru'] += 1
-                else: caches['lru'].put(key, f"v-{key}")
-                state_to_send['lru_cache'] = {"state": caches['lru'].get_state(), "hits": hits['lru'], "hit_rate": hits['lru'] / (i + 1)}
-
-            if caches['lfu']:
-                if caches['lfu'].get(key) is not None: hits['lfu'] += 1
-                else: caches['lfu'].put(key, f"v-{key}")
-                state_to_send['lfu_cache'] = {"state": caches['lfu'].get_state(), "hits": hits['lfu'], "hit_rate": hits['lfu'] / (i + 1)}
-
-            if caches['lruk']:
-                lruk_event = caches['lruk'].put(key, f"v-{key}")
-                if lruk_event['location'] == 'main_cache': hits['lruk'] += 1
-                state_to_send['lruk_cache'] = {"state": caches['lruk'].get_state(), "hits": hits['lruk'], "hit_rate": hits['lruk'] / (i + 1), "last_event": lruk_event}
-            
-            await websocket.send_json(state_to_send)
-            await asyncio.sleep(config.speed)
+        # Cache work runs ahead in its own task; this loop only paces the sends.
+        queue: asyncio.Queue = asyncio.Queue(maxsize=64)
+        producer = asyncio.create_task(_simulate(caches, workload, queue, throttle=config.speed == 0))
+        try:
+            while (frame := await queue.get()) is not None:
+                if isinstance(frame, Exception): raise frame
+                await websocket.send_bytes(frame)
+                await asyncio.sleep(config.speed)
+        finally:
+            producer.cancel()
 
         await websocket.close()
     except WebSocketDisconnect:
@@ -227,3 +520,9 @@ async def simulation_endpoint(websocket: WebSocket):
     except Exception as e:
         print(f"An error occurred: {e}")
         await websocket.close(code=1011, reason=str(e))
+
+if __name__ == "__main__":
+    import uvicorn
+    # "auto" selects uvloop when it is installed (it is not available on Windows).
+    # The gunicorn UvicornWorker used on Render makes the same choice.
+    uvicorn.run(app, host="0.0.0.0", port=8000, loop="auto")
@@ -17,6 +17,9 @@ document.addEventListener('DOMContentLoaded', () => {
     };
 
     let hitRateChart = null, socket = null, isPaused = false;
+    // Client-side copy of each cache, rebuilt from the per-step diffs the server sends.
+    let model = null;
+    const frameDecoder = new TextDecoder();
     let activeCaches = { lru: true, lfu: true, lruk: true };
 
     form.addEventListener('submit', handleStart);
@@ -69,6 +72,7 @@ document.addEventListener('DOMContentLoaded', () => {
         statusMessage.textContent = 'Connecting...';
         resetUI();
         initializeChart();
+        model = newModel();
 
         // --- UPDATED CODE ---
         // Dynamically determine WebSocket protocol and host
@@ -77,6 +81,7 @@ document.addEventListener('DOMContentLoaded', () => {
         const wsUrl = `${wsProtocol}//${wsHost}/ws/simulation`;
         
         socket = new WebSocket(wsUrl);
+        socket.binaryType = 'arraybuffer';
         // --- END OF UPDATED CODE ---
 
         socket.onopen = () => {
@@ -84,8 +89,18 @@ document.addEventListener('DOMContentLoaded', () => {
             socket.send(JSON.stringify(config));
         };
         socket.onmessage = (msg) => {
+            // Frames arrive as orjson-encoded binary messages.
+            const data = JSON.parse(frameDecoder.decode(msg.data));
+            // Fast mode (API-only: it needs speed 0) sends a single frame with final hit
+            // counts and no cache contents, so there is nothing to replay.
+            if (data.fast_mode) {
+                updateStats(data);
+                updateChart(data);
+                return;
+            }
+            // Diffs must be applied even while paused, or the copy drifts from the server.
+            applyFrame(data);
             if (isPaused) return;
-            const data = JSON.parse(msg.data);
             updateUI(data);
             updateChart(data);
         };
@@ -110,6 +125,7 @@ document.addEventListener('DOMContentLoaded', () => {
     
     function handleClear() {
         if (socket) socket.close();
+        model = newModel();
         resetUI();
         initializeChart();
         statusMessage.textContent = 'Ready to start simulation.';
@@ -122,7 +138,7 @@ document.addEventListener('DOMContentLoaded', () => {
         else element.classList.remove('hover-active');
     }
 
-    function updateUI(data) {
+    function updateStats(data) {
         statusMessage.innerHTML = `Step ${data.step}/${data.total_steps}: Accessing Key <span class="highlight">${data.current_key}</span>`;
         Object.keys(activeCaches).forEach(key => {
             if (!activeCaches[key] || !data[`${key}_cache`]) return;
@@ -130,14 +146,80 @@ document.addEventListener('DOMContentLoaded', () => {
             const misses = data.step - cacheData.hits;
             ui[key].hits.textContent = cacheData.hits;
             ui[key].misses.textContent = misses;
-            ui[key].rate.textContent = (cacheData.hit_rate * 100).toFixed(2) + '%';
+            ui[key].rate.textContent = (cacheData.hits / data.step * 100).toFixed(2) + '%';
         });
-        if (activeCaches.lru && data.lru_cache) updateList(ui.lru.list, data.lru_cache.state, data.current_key, null, 'lru');
-        if (activeCaches.lfu && data.lfu_cache) updateList(ui.lfu.list, data.lfu_cache.state, data.current_key, null, 'lfu');
+    }
+
+    function updateUI(data) {
+        updateStats(data);
+        if (activeCaches.lru && data.lru_cache) updateList(ui.lru.list, model.lru, data.current_key, null, 'lru');
+        if (activeCaches.lfu && data.lfu_cache) updateList(ui.lfu.list, model.lfu.keys, data.current_key, null, 'lfu');
         if (activeCaches.lruk && data.lruk_cache) {
-            updateList(ui.lruk.history, data.lruk_cache.state.history_cache, data.current_key, null, 'lruk');
-            updateList(ui.lruk.main, data.lruk_cache.state.main_cache, data.current_key, data.lruk_cache.last_event, 'lruk');
-            ui.lruk.adapt.textContent = document.getElementById('adaptive-k').checked ? `(K=${data.lruk_cache.state.current_k})` : '';
+            updateList(ui.lruk.history, model.lruk.history, data.current_key, null, 'lruk');
+            updateList(ui.lruk.main, model.lruk.main, data.current_key, data.lruk_cache.last_event, 'lruk');
+            ui.lruk.adapt.textContent = document.getElementById('adaptive-k').checked ? `(K=${data.lruk_cache.current_k})` : '';
+        }
+    }
+
+    function newModel() {
+        return { lru: [], lfu: { keys: [], counts: new Map() }, lruk: { history: [], main: [] } };
+    }
+
+    function removeItem(items, item) {
+        const idx = items.indexOf(item);
+        if (idx !== -1) items.splice(idx, 1);
+    }
+
+    function moveToFront(items, item) {
+        removeItem(items, item);
+        items.unshift(item);
+    }
+
+    function applyFrame(data) {
+        const key = data.current_key;
+        const lru = data.lru_cache, lfu = data.lfu_cache, lruk = data.lruk_cache;
+        if (lru) {
+            if (lru.state) model.lru = lru.state.slice();
+            else {
+                if (lru.evicted !== null) removeItem(model.lru, lru.evicted);
+                moveToFront(model.lru, key);
+            }
+        }
+        if (lfu) {
+            const m = model.lfu;
+            if (lfu.state) {
+                m.keys = lfu.state.slice();
+                m.counts = new Map(lfu.state.map((item, idx) => [item, lfu.counts[idx]]));
+            } else {
+                if (lfu.evicted !== null) {
+                    removeItem(m.keys, lfu.evicted);
+                    m.counts.delete(lfu.evicted);
+                }
+                // Keys are ordered by count, most recently used first within a count.
+                const count = lfu.hit ? m.counts.get(key) + 1 : 1;
+                removeItem(m.keys, key);
+                m.counts.set(key, count);
+                const idx = m.keys.findIndex(item => m.counts.get(item) >= count);
+                m.keys.splice(idx === -1 ? m.keys.length : idx, 0, key);
+            }
+        }
+        if (lruk) {
+            const m = model.lruk, ev = lruk.last_event;
+            if (lruk.state) {
+                m.history = lruk.state.history_cache.slice();
+                m.main = lruk.state.main_cache.slice();
+            } else if (ev.location === 'main_cache') {
+                moveToFront(m.main, key);
+            } else if (ev.location === 'history_cache') {
+                moveToFront(m.history, key);
+                if (ev.promoted) {
+                    if (ev.evicted !== null) removeItem(m.main, ev.evicted);
+                    moveToFront(m.main, key);
+                }
+            } else {
+                if (ev.evicted !== null) removeItem(m.history, ev.evicted);
+                moveToFront(m.history, key);
+            }
         }
     }
 
@@ -195,9 +277,10 @@ document.addEventListener('DOMContentLoaded', () => {
         hitRateChart.data.labels.push(data.step);
         
         const datasets = hitRateChart.data.datasets;
-        datasets[0].data.push(data.lru_cache ? data.lru_cache.hit_rate : NaN);
-        datasets[1].data.push(data.lfu_cache ? data.lfu_cache.hit_rate : NaN);
-        datasets[2].data.push(data.lruk_cache ? data.lruk_cache.hit_rate : NaN);
+        // The server sends cumulative hits only; the hit rate is hits per step so far.
+        datasets[0].data.push(data.lru_cache ? data.lru_cache.hits / data.step : NaN);
+        datasets[1].data.push(data.lfu_cache ? data.lfu_cache.hits / data.step : NaN);
+        datasets[2].data.push(data.lruk_cache ? data.lruk_cache.hits / data.step : NaN);
 
         hitRateChart.update('none');
     }
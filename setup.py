@@ -0,0 +1,8 @@
+"""Builds the optional compiled cache core: python setup.py build_ext --inplace"""
+from setuptools import setup
+from Cython.Build import cythonize
+
+setup(
+    name="cache-visualizer-core",
+    ext_modules=cythonize("_cache_core.pyx"),
+)
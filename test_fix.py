@@ -6,73 +6,285 @@ This script tests the cache implementations individually.
 
 import sys
 import os
+import asyncio
+import importlib.util
+import random
+import tracemalloc
 sys.path.append(os.path.join(os.path.dirname(__file__), 'Backend'))
 
-from main import LRUCache, LFUCache, LRUKCache
+import numpy as np
+import orjson
+
+import main as backend
+from main import simulate_lru, simulate_lfu, simulate_lruk, generate_workload
+
+def _load_pure_backend():
+    """Imports main.py a second time with _cache_core blocked, to reach its pure-Python classes."""
+    saved = sys.modules.get("_cache_core")
+    sys.modules["_cache_core"] = None
+    try:
+        spec = importlib.util.spec_from_file_location("main_pure", backend.__file__)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+    finally:
+        if saved is None: del sys.modules["_cache_core"]
+        else: sys.modules["_cache_core"] = saved
+
+pure_backend = _load_pure_backend()
+try:
+    import _cache_core
+except ImportError:
+    _cache_core = None
+
+# Every cache implementation available in this checkout: the compiled core is only
+# present after `python setup.py build_ext --inplace`.
+CACHE_IMPLS = [("pure-Python", pure_backend.LRUCache, pure_backend.LFUCache, pure_backend.LRUKCache)]
+if _cache_core is not None:
+    CACHE_IMPLS.append(("compiled", _cache_core.LRUCache, _cache_core.LFUCache, backend.LRUKCache))
 
 def test_lru_cache():
     print("Testing LRU Cache...")
-    cache = LRUCache(3)
-    
-    # Test basic operations
-    cache.put("A", "value_A")
-    cache.put("B", "value_B") 
-    cache.put("C", "value_C")
-    
-    print("Initial state:", cache.get_state())
-    
-    # Access A (should move it to end)
-    cache.get("A")
-    print("After accessing A:", cache.get_state())
-    
-    # Add D (should evict B)
-    cache.put("D", "value_D")
-    print("After adding D:", cache.get_state())
-    
+    for name, LRUCache, _, _ in CACHE_IMPLS:
+        print(f"[{name}]")
+        cache = LRUCache(3)
+
+        # Test basic operations
+        cache.put("A", "value_A")
+        cache.put("B", "value_B") 
+        cache.put("C", "value_C")
+
+        print("Initial state:", cache.get_state())
+
+        # Access A (should move it to end)
+        cache.get("A")
+        print("After accessing A:", cache.get_state())
+
+        # Add D (should evict B)
+        evicted = cache.put("D", "value_D")
+        print("After adding D:", cache.get_state(), "evicted:", evicted)
+        assert evicted == "B"
+
+        # Touch C (should move it to the front without reading it)
+        assert cache.touch("C") and not cache.touch("B")
+        print("After touching C:", cache.get_state())
+
+        # Set A (should replace its value without moving it)
+        cache.set("A", "new_A")
+        assert cache.get_state() == ["C", "D", "A"] and cache.get("A") == "new_A"
+
+        # Set B (should fail: set never inserts, so it cannot bypass eviction)
+        try:
+            cache.set("B", "value_B")
+            raise AssertionError("set() inserted a missing key")
+        except KeyError:
+            pass
+        assert cache.get_state() == ["A", "C", "D"]
+
     print("LRU Cache test: PASSED ✓\n")
 
 def test_lfu_cache():
     print("Testing LFU Cache...")
-    cache = LFUCache(3)
-    
-    # Test basic operations
-    cache.put("A", "value_A")
-    cache.put("B", "value_B")
-    cache.put("C", "value_C")
-    
-    print("Initial state:", cache.get_state())
-    
-    # Access A multiple times
-    cache.get("A")
-    cache.get("A")
-    cache.get("B")
-    
-    print("After accessing A twice and B once:", cache.get_state())
-    
-    # Add D (should evict C - least frequently used)
-    cache.put("D", "value_D")
-    print("After adding D:", cache.get_state())
-    
+    for name, _, LFUCache, _ in CACHE_IMPLS:
+        print(f"[{name}]")
+        cache = LFUCache(3)
+
+        # Test basic operations
+        cache.put("A", "value_A")
+        cache.put("B", "value_B")
+        cache.put("C", "value_C")
+
+        print("Initial state:", cache.get_state())
+
+        # Access A multiple times
+        cache.get("A")
+        cache.get("A")
+        cache.get("B")
+
+        print("After accessing A twice and B once:", cache.get_state())
+
+        # Add D (should evict C - least frequently used)
+        evicted = cache.put("D", "value_D")
+        print("After adding D:", cache.get_state(), "evicted:", evicted)
+        assert evicted == "C"
+        assert cache.get_frequencies() == [1, 2, 3]
+
     print("LFU Cache test: PASSED ✓\n")
 
 def test_lruk_cache():
     print("Testing LRU-K Cache...")
-    cache = LRUKCache(3, 2)  # Capacity 3, K=2
-    
-    # Test basic operations
-    result1 = cache.put("A", "value_A")
-    print("Put A:", result1)
-    
-    result2 = cache.put("A", "value_A")  # Second access
-    print("Put A again:", result2)
-    
-    result3 = cache.put("B", "value_B")
-    print("Put B:", result3)
-    
-    print("Current state:", cache.get_state())
-    
+    for name, _, _, LRUKCache in CACHE_IMPLS:
+        print(f"[{name}]")
+        cache = LRUKCache(2, 2)  # Capacity 2, K=2
+
+        # Test basic operations
+        def put(key):
+            event = cache.put(key, f"value_{key}")
+            print(f"Put {key}:", event)
+            return event["location"], event["promoted"], event["evicted"]
+
+        assert put("A") == ("new", False, None)
+        assert put("B") == ("new", False, None)
+        # C is new and the history is full, so A is evicted from the history
+        assert put("C") == ("new", False, "A")
+        # Second accesses promote B and C into the main cache
+        assert put("B") == ("history_cache", True, None)
+        assert put("C") == ("history_cache", True, None)
+        assert put("C") == ("main_cache", False, None)
+        assert put("D") == ("new", False, "B")
+        # Promoting D fills the main cache past capacity, evicting its LRU key B
+        assert put("D") == ("history_cache", True, "B")
+
+        print("Current state:", cache.get_state())
+        assert cache.get_state() == {"history_cache": ["D", "C"], "main_cache": ["D", "C"], "current_k": 2}
+
     print("LRU-K Cache test: PASSED ✓\n")
 
+def test_lruk_frames_replay():
+    print("Testing LRU-K diff frames against the cache state...")
+    # Random keys over a small alphabet evict from both the history and the main cache
+    workload = generate_workload("random", "", 2000)
+    caches = {'lru': None, 'lfu': None, 'lruk': backend.LRUKCache(5, 2, adaptive=True)}
+
+    async def consume():
+        queue = asyncio.Queue(maxsize=64)
+        producer = asyncio.create_task(backend._simulate(caches, workload, queue))
+        frames = []
+        while (frame := await queue.get()) is not None:
+            frames.append(orjson.loads(frame))
+        await producer
+        return frames
+
+    frames = asyncio.run(consume())
+    assert len(frames) == len(workload)
+
+    def move_to_front(items, key):
+        if key in items: items.remove(key)
+        items.insert(0, key)
+
+    # Replay the frames the way script.js does and compare with a cache fed the same keys
+    reference = backend.LRUKCache(5, 2, adaptive=True)
+    history, main_cache = [], []
+    for frame, key in zip(frames, workload):
+        reference.put(key, key)
+        lruk = frame["lruk_cache"]
+        event = lruk["last_event"]
+        if "state" in lruk:
+            history, main_cache = lruk["state"]["history_cache"][:], lruk["state"]["main_cache"][:]
+        elif event["location"] == "main_cache":
+            move_to_front(main_cache, key)
+        elif event["location"] == "history_cache":
+            move_to_front(history, key)
+            if event["promoted"]:
+                if event["evicted"] is not None: main_cache.remove(event["evicted"])
+                move_to_front(main_cache, key)
+        else:
+            if event["evicted"] is not None: history.remove(event["evicted"])
+            move_to_front(history, key)
+        assert {"history_cache": history, "main_cache": main_cache, "current_k": lruk["current_k"]} == reference.get_state()
+
+    print("LRU-K frame replay test: PASSED ✓\n")
+
+def test_batch_simulators():
+    print("Testing fast-mode batch simulators...")
+    workload = list("ABCABDAEABFBAGCA")
+    lru, lfu, lruk = pure_backend.LRUCache(3), pure_backend.LFUCache(3), pure_backend.LRUKCache(3, 2)
+    hits = [0, 0, 0]
+    for key in workload:
+        if lru.get(key) is not None: hits[0] += 1
+        else: lru.put(key, key)
+        if lfu.get(key) is not None: hits[1] += 1
+        else: lfu.put(key, key)
+        if lruk.put(key, key)["location"] == "main_cache": hits[2] += 1
+
+    ids = {}
+    keys = np.array([ids.setdefault(key, len(ids)) for key in workload], dtype=np.int64)
+    batch_hits = [simulate_lru(keys, len(ids), 3), simulate_lfu(keys, len(ids), 3), simulate_lruk(keys, len(ids), 3, 2, False)]
+    print("Step-by-step hits:", hits, "batch hits:", batch_hits)
+    assert batch_hits == hits
+    # Like LFUCache.put, a non-positive capacity caches nothing
+    assert simulate_lfu(keys, len(ids), 0) == simulate_lfu(keys, len(ids), -1) == 0
+
+    print("Batch simulator test: PASSED ✓\n")
+
+def test_cache_implementations_agree():
+    print("Testing pure-Python and compiled caches against each other...")
+    if _cache_core is None:
+        print("Compiled core not built; skipping.\n")
+        return
+    rng = random.Random(0)
+    for capacity in (1, 2, 5, 16, 40):
+        pure = [pure_backend.LRUCache(capacity), pure_backend.LFUCache(capacity)]
+        compiled = [_cache_core.LRUCache(capacity), _cache_core.LFUCache(capacity)]
+        for _ in range(2000):
+            key = f"k{rng.randrange(30)}"
+            for a, b in zip(pure, compiled):
+                if rng.random() < 0.5: assert a.get(key) == b.get(key)
+                else: assert a.put(key, key) == b.put(key, key)
+                assert a.get_state() == b.get_state()
+        assert pure[1].get_frequencies() == compiled[1].get_frequencies()
+    print("Implementation agreement test: PASSED ✓\n")
+
+def test_large_capacity_allocates_lazily():
+    print("Testing memory use of a large, empty cache...")
+    for name, LRUCache, LFUCache, LRUKCache in CACHE_IMPLS:
+        tracemalloc.start()
+        try:
+            caches = [LRUCache(20_000_000), LFUCache(20_000_000), LRUKCache(20_000_000, 2)]
+            for cache in caches: cache.put("A", "value_A")
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        print(f"[{name}] peak bytes:", peak)
+        # Slots are allocated as keys arrive, not sized up front from the capacity
+        assert peak < 1_000_000
+
+    print("Lazy allocation test: PASSED ✓\n")
+
+def test_throttled_frames_stream():
+    print("Testing throttled frame streaming...")
+    workload = generate_workload("realistic", "", 50000)
+    caches = {'lru': backend.LRUCache(20), 'lfu': backend.LFUCache(20), 'lruk': backend.LRUKCache(20, 2)}
+
+    async def consume():
+        queue = asyncio.Queue(maxsize=64)
+        producer = asyncio.create_task(backend._simulate(caches, workload, queue, throttle=True))
+        first = await queue.get()
+        # The first frame must reach the sender while the simulation is still running
+        still_running = not producer.done()
+        frames = [first]
+        while (frame := await queue.get()) is not None:
+            frames.append(frame)
+        return still_running, [orjson.loads(frame) for frame in frames]
+
+    still_running, frames = asyncio.run(consume())
+    print("Frames:", len(frames), "first available before the producer finished:", still_running)
+    assert still_running
+    assert 2 <= len(frames) < len(workload)
+    assert frames[-1]["step"] == len(workload)
+    assert all("state" in frame["lru_cache"] for frame in frames)
+
+    print("Throttled streaming test: PASSED ✓\n")
+
+def test_generate_workload():
+    print("Testing workload generation...")
+    for workload_type in ("scan", "realistic", "random"):
+        assert generate_workload(workload_type, "", -1) == []
+        assert len(generate_workload(workload_type, "", 7)) == 7
+
+    # Names past the cap are formatted on the fly instead of growing the shared table
+    cap, table = backend._ITEM_NAMES_CAP, backend._ITEM_NAMES[:]
+    backend._ITEM_NAMES.clear()
+    backend._ITEM_NAMES_CAP = 10
+    try:
+        assert generate_workload("scan", "", 12)[-2:] == ["item-10", "item-11"]
+        assert len(backend._ITEM_NAMES) == 10
+    finally:
+        backend._ITEM_NAMES_CAP = cap
+        backend._ITEM_NAMES[:] = table
+
+    print("Workload generation test: PASSED ✓\n")
+
 def main():
     print("=" * 50)
     print("Testing Cache Implementations After Fix")
@@ -82,6 +294,12 @@ def main():
         test_lru_cache()
         test_lfu_cache() 
         test_lruk_cache()
+        test_lruk_frames_replay()
+        test_batch_simulators()
+        test_cache_implementations_agree()
+        test_large_capacity_allocates_lazily()
+        test_throttled_frames_stream()
+        test_generate_workload()
         
         print("All tests passed! The fix should work correctly.")
         print("You can now run the frontend and backend to test the visualization.")